@@ -8,6 +8,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
 from model import SiameseNetwork # We import the same model structure
+from shared_weights import build_with_weights
 
 # --- Configuration ---
 class InferenceConfig:
@@ -22,8 +23,8 @@ class InferenceEngine:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         print(f"Using device: {self.device}")
 
-        self.model = SiameseNetwork()
-        self.model.load_state_dict(torch.load(InferenceConfig.MODEL_PATH, map_location=self.device))
+        # Memory-mapped when WEIGHT_LOAD_MODE is "mmap"
+        self.model = build_with_weights(lambda: SiameseNetwork(pretrained=False), InferenceConfig.MODEL_PATH, self.device)
         self.model.to(self.device)
         self.model.eval() # IMPORTANT: Set model to evaluation mode
 
@@ -43,3 +44,13 @@ class InferenceEngine:
             embedding = self.model.forward_one(image_tensor)
 
         return embedding.cpu().numpy()
+
+    def get_embeddings(self, images):
+        """Returns style embeddings for a batch of already decoded images, one row per image."""
+        image_tensor = torch.stack([self.transform(image.convert("RGB")) for image in images])
+        image_tensor = image_tensor.to(self.device)
+
+        with torch.no_grad():
+            embeddings = self.model.forward_one(image_tensor)
+
+        return embeddings.cpu().numpy()
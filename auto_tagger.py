@@ -1,42 +1,81 @@
 # auto_tagger.py
+import os
+import torch
+import sentence_transformers
+import tokenizers
+import transformers
+from huggingface_hub import snapshot_download
 from sentence_transformers import SentenceTransformer, util
 from PIL import Image
 from config import TAG_OPTIONS, DEFAULT_TAGS # Import from our new config file
+from shared_weights import load_shared_module
+
+CLIP_MODEL = 'clip-ViT-B-32'
+
+def _clip_revision():
+    """Returns the hub commit of the CLIP model, fetching only its small modules.json."""
+    snapshot_path = snapshot_download(f"sentence-transformers/{CLIP_MODEL}", allow_patterns=["modules.json"])
+    return os.path.basename(snapshot_path) # The hub cache names snapshot folders by commit hash
 
 class AutoTagger:
     def __init__(self):
         print("Loading Vision-Language Model (CLIP)...")
-        self.model = SentenceTransformer('clip-ViT-B-32')
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        # In "mmap" mode this maps a snapshot shared by all workers instead of loading CLIP again
+        self.model = load_shared_module(
+            # The snapshot pickles sentence-transformers and transformers objects, so their versions are part of its key
+            CLIP_MODEL, lambda: (f"{_clip_revision()}|sentence-transformers={sentence_transformers.__version__}"
+                                 f"|transformers={transformers.__version__}|tokenizers={tokenizers.__version__}"),
+            lambda: SentenceTransformer(CLIP_MODEL, device=device), device)
+        self.tag_embeddings = None
         print("VLM Model loaded.")
 
-    def _predict_best_tag(self, image: Image.Image, tags: list[str]) -> str:
-        """Finds the best matching tag for an image from a list of candidates."""
-        text_embeddings = self.model.encode(tags)
-        image_embedding = self.model.encode(image)
-        similarities = util.cos_sim(image_embedding, text_embeddings)
-        best_match_index = similarities.argmax()
-        return tags[best_match_index]
+    def _get_tag_embeddings(self):
+        """
+        The candidate tags never change, so they are encoded once instead of for every image.
+        This happens on first use rather than in __init__: in "prefork" mode __init__ runs in the
+        parent before it forks, and a forward pass there would start torch's OpenMP thread pool,
+        which the forked workers can't use.
+        """
+        if self.tag_embeddings is None:
+            self.tag_embeddings = {category: self.model.encode(tags, convert_to_tensor=True)
+                                   for category, tags in TAG_OPTIONS.items()}
+        return self.tag_embeddings
+
+    def _predict_best_tags(self, image_embeddings, category: str) -> list[str]:
+        """Finds the best matching tag in a category for each image embedding."""
+        similarities = util.cos_sim(image_embeddings, self._get_tag_embeddings()[category])
+        return [TAG_OPTIONS[category][i] for i in similarities.argmax(dim=1).tolist()]
 
     def tag_image(self, image: Image.Image):
         """Generates a full set of tags for a given clothing image."""
         print("Auto-tagging image...")
+        generated_tags = self.tag_images([image])[0]
+        print(f"Generated Tags: {generated_tags}")
+        return generated_tags
+
+    def tag_images(self, images: list[Image.Image], batch_size: int = 32):
+        """Generates tags for a batch of clothing images, encoding each image only once."""
+        image_embeddings = self.model.encode(images, batch_size=batch_size, convert_to_tensor=True)
 
         # Get the best tag for each category by reading from the config
-        item_type = self._predict_best_tag(image, TAG_OPTIONS["type"])
-        item_style = self._predict_best_tag(image, TAG_OPTIONS["style"])
-        item_color = self._predict_best_tag(image, TAG_OPTIONS["color"])
-        item_pattern = self._predict_best_tag(image, TAG_OPTIONS["pattern"])
-
-        # Combine the generated tags with the defaults from the config
-        generated_tags = {
-            "ItemName": f"{item_style} {item_color} {item_type}",
-            "Type": item_type,
-            "Color": item_color,
-            "ColorFamily": item_color, # Simple mapping for now
-            "Style": item_style,
-            "Pattern": item_pattern,
-            **DEFAULT_TAGS # Unpacks the default values (MinTemp, etc.)
-        }
+        predictions = {category: self._predict_best_tags(image_embeddings, category) for category in TAG_OPTIONS}
 
-        print(f"Generated Tags: {generated_tags}")
-        return generated_tags
\ No newline at end of file
+        all_tags = []
+        for i in range(len(images)):
+            item_type = predictions["type"][i]
+            item_style = predictions["style"][i]
+            item_color = predictions["color"][i]
+            item_pattern = predictions["pattern"][i]
+
+            # Combine the generated tags with the defaults from the config
+            all_tags.append({
+                "ItemName": f"{item_style} {item_color} {item_type}",
+                "Type": item_type,
+                "Color": item_color,
+                "ColorFamily": item_color, # Simple mapping for now
+                "Style": item_style,
+                "Pattern": item_pattern,
+                **DEFAULT_TAGS # Unpacks the default values (MinTemp, etc.)
+            })
+        return all_tags
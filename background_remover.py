@@ -0,0 +1,27 @@
+# background_remover.py
+# rembg runs outside the API process so background removal never holds its GIL: either in
+# the shared rembg_service.py or in a per-worker process pool. This module is what those
+# processes import, so keep it light.
+import io
+import os
+from PIL import Image
+from rembg import remove, new_session
+
+_session = None
+
+def init_worker():
+    """Creates this process's rembg session once, when the pool or the service starts."""
+    global _session
+    _session = new_session()
+
+def worker_pid() -> int:
+    """Returns this process's id. Used at startup to start the pool and find its processes."""
+    return os.getpid()
+
+def remove_background(image_bytes: bytes) -> bytes:
+    """Removes the background from an encoded image and returns the result as PNG bytes."""
+    input_image = Image.open(io.BytesIO(image_bytes))
+    output_image = remove(input_image, session=_session)
+    buffer = io.BytesIO()
+    output_image.save(buffer, format="PNG")
+    return buffer.getvalue()
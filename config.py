@@ -1,5 +1,6 @@
 # config.py
 # Central configuration for the AI Stylist application
+import os
 
 # --- AI Auto-Tagger Settings ---
 TAG_OPTIONS = {
@@ -14,4 +15,27 @@ DEFAULT_TAGS = {
     "MinTemp": 15,
     "MaxTemp": 30,
     "ConditionType": "Any"
-}
\ No newline at end of file
+}
+
+# --- Model Weight Loading ---
+# "mmap":    weights are memory-mapped read-only from SHARED_WEIGHTS_DIR, so every
+#            uvicorn worker shares one copy through the OS page cache.
+# "prefork": weights are loaded once in the parent before it forks the workers
+#            (gunicorn main:app -k uvicorn.workers.UvicornWorker -w N --preload)
+#            and are inherited copy-on-write.
+# "private": every worker loads its own copy.
+WEIGHT_LOAD_MODE = os.getenv("WEIGHT_LOAD_MODE", "mmap")
+SHARED_WEIGHTS_DIR = "shared_weights"
+
+# --- Request Worker Pools ---
+# CLIP and ResNet calls run on a thread pool (torch releases the GIL while it computes).
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "2"))
+
+# rembg can't be memory-mapped like the torch models. To share it between server workers, run
+# rembg_service.py once and set REMBG_SERVICE_URL: the box then holds a single copy of the
+# rembg model (~170 MB for u2net), used by REMBG_THREADS threads in that service.
+# Without REMBG_SERVICE_URL each server worker starts its own pool of REMBG_PROCESSES processes,
+# each with a private copy of the model: N workers x REMBG_PROCESSES copies in total.
+REMBG_SERVICE_URL = os.getenv("REMBG_SERVICE_URL") # e.g. http://127.0.0.1:8001
+REMBG_THREADS = int(os.getenv("REMBG_THREADS", "2"))
+REMBG_PROCESSES = int(os.getenv("REMBG_PROCESSES", "1"))
@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 import mysql.connector
 from mysql.connector import pooling, Error
+import aiomysql
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,25 +14,48 @@ DB_CONFIG = {
     # Read the password from the environment variables
     'password': os.getenv("DB_PASSWORD")
 }
+POOL_SIZE = 5
 
-# (The rest of the database.py file remains exactly the same)
+# --- Blocking pool, used by scripts such as seed_catalog.py ---
+# Created on first use so the API server, which only uses the async pool, never opens it.
 connection_pool = None
-try:
-    connection_pool = pooling.MySQLConnectionPool(pool_name="stylist_pool", pool_size=5, **DB_CONFIG)
-    print("MySQL Connection Pool created successfully.")
-except Error as e:
-    print(f"Error while creating MySQL connection pool: {e}")
 
 def get_db_connection():
-    if connection_pool is None: return None
+    global connection_pool
+    if connection_pool is None:
+        try:
+            connection_pool = pooling.MySQLConnectionPool(pool_name="stylist_pool", pool_size=POOL_SIZE, **DB_CONFIG)
+            print("MySQL Connection Pool created successfully.")
+        except Error as e:
+            print(f"Error while creating MySQL connection pool: {e}"); return None
     try: return connection_pool.get_connection()
     except Error as e: print(f"Error getting connection from pool: {e}"); return None
 
-def get_wardrobe_by_user(user_id: int):
+# --- Non-blocking pool, used by the API endpoints ---
+# It has to be created inside the server's event loop, so main.py opens it at startup.
+async_pool = None
+
+async def init_async_pool():
+    global async_pool
+    try:
+        async_pool = await aiomysql.create_pool(host=DB_CONFIG['host'], db=DB_CONFIG['database'],
+                                                user=DB_CONFIG['user'], password=DB_CONFIG['password'] or "",
+                                                minsize=1, maxsize=POOL_SIZE,
+                                                # Reads must not leave a transaction open: the pool closes
+                                                # such connections on release. Writes begin() their own.
+                                                autocommit=True)
+        print("Async MySQL Connection Pool created successfully.")
+    except aiomysql.Error as e:
+        print(f"Error while creating async MySQL connection pool: {e}")
+
+async def close_async_pool():
+    if async_pool is None: return
+    async_pool.close()
+    await async_pool.wait_closed()
+
+async def get_wardrobe_by_user(user_id: int):
     """Fetches a user's wardrobe by joining the user_wardrobe and base_items tables."""
-    conn = get_db_connection()
-    if conn is None: return []
-    cursor = conn.cursor(dictionary=True)
+    if async_pool is None: return []
     # SQL JOIN to combine information from both tables
     query = """
         SELECT b.* FROM base_items b
@@ -39,61 +63,65 @@ def get_wardrobe_by_user(user_id: int):
         WHERE w.user_id = %s
     """
     try:
-        cursor.execute(query, (user_id,))
-        return cursor.fetchall()
-    except Error as e:
+        async with async_pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, (user_id,))
+                return await cursor.fetchall()
+    except aiomysql.Error as e:
         print(f"Error fetching wardrobe: {e}"); return []
-    finally:
-        if conn and conn.is_connected(): cursor.close(); conn.close()
 
-def add_clothing_item(user_id: int, item: dict, image_path: str):
+async def add_clothing_item(user_id: int, item: dict, image_path: str):
     """
     First, adds the item to the master catalog if it's new.
     Then, links the item to the user.
     """
-    conn = get_db_connection()
-    if conn is None: return False, "Database connection failed"
-    cursor = conn.cursor()
+    if async_pool is None: return False, "Database connection failed"
     try:
-        # Check if this item (based on image path) already exists in the master catalog
-        cursor.execute("SELECT id FROM base_items WHERE ImagePath = %s", (image_path,))
-        result = cursor.fetchone()
+        async with async_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await conn.begin()
+                    # Check if this item (based on image path) already exists in the master catalog
+                    await cursor.execute("SELECT id FROM base_items WHERE ImagePath = %s", (image_path,))
+                    result = await cursor.fetchone()
 
-        if result:
-            item_id = result[0]
-        else:
-            # If not, insert it into the master catalog
-            query_insert_base = """
-                INSERT INTO base_items (ItemName, Type, Color, ColorFamily, Style, Pattern, MinTemp, MaxTemp, ConditionType, ImagePath)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            values_base = (item['ItemName'], item['Type'], item['Color'], item['ColorFamily'], item['Style'],
-                           item['Pattern'], item['MinTemp'], item['MaxTemp'], item['ConditionType'], image_path)
-            cursor.execute(query_insert_base, values_base)
-            item_id = cursor.lastrowid # Get the ID of the new item
+                    if result:
+                        item_id = result[0]
+                    else:
+                        # If not, insert it into the master catalog
+                        query_insert_base = """
+                            INSERT INTO base_items (ItemName, Type, Color, ColorFamily, Style, Pattern, MinTemp, MaxTemp, ConditionType, ImagePath)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """
+                        values_base = (item['ItemName'], item['Type'], item['Color'], item['ColorFamily'], item['Style'],
+                                       item['Pattern'], item['MinTemp'], item['MaxTemp'], item['ConditionType'], image_path)
+                        await cursor.execute(query_insert_base, values_base)
+                        item_id = cursor.lastrowid # Get the ID of the new item
 
-        # Link the base item to the user
-        cursor.execute("INSERT INTO user_wardrobe (user_id, item_id) VALUES (%s, %s)", (user_id, item_id))
-        conn.commit()
-        return True, f"Item '{item['ItemName']}' added to wardrobe."
-    except Error as e:
-        conn.rollback(); return False, str(e)
-    finally:
-        if conn and conn.is_connected(): cursor.close(); conn.close()
+                    # Link the base item to the user
+                    await cursor.execute("INSERT INTO user_wardrobe (user_id, item_id) VALUES (%s, %s)", (user_id, item_id))
+                    await conn.commit()
+                    return True, f"Item '{item['ItemName']}' added to wardrobe."
+                except aiomysql.Error as e:
+                    await conn.rollback(); return False, str(e)
+    except aiomysql.Error as e:
+        return False, str(e)
 
-def delete_clothing_item(user_id: int, item_id: int):
+async def delete_clothing_item(user_id: int, item_id: int):
     """Deletes an item from a user's wardrobe (removes the link)."""
-    conn = get_db_connection()
-    if conn is None: return False, "Database connection failed"
-    cursor = conn.cursor()
+    if async_pool is None: return False, "Database connection failed"
     # We only delete the link in user_wardrobe, not the item from the master catalog
     query = "DELETE FROM user_wardrobe WHERE item_id = %s AND user_id = %s"
     try:
-        cursor.execute(query, (item_id, user_id))
-        conn.commit()
-        if cursor.rowcount > 0: return True, "Item removed from wardrobe"
-        else: return False, "Item not found in user's wardrobe"
-    except Error as e:
-        conn.rollback(); return False, str(e)
-    finally:
-        if conn and conn.is_connected(): cursor.close(); conn.close()
\ No newline at end of file
+        async with async_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await conn.begin()
+                    await cursor.execute(query, (item_id, user_id))
+                    await conn.commit()
+                    if cursor.rowcount > 0: return True, "Item removed from wardrobe"
+                    else: return False, "Item not found in user's wardrobe"
+                except aiomysql.Error as e:
+                    await conn.rollback(); return False, str(e)
+    except aiomysql.Error as e:
+        return False, str(e)
@@ -1,21 +1,28 @@
 import os
+import io
 import shutil
 import time
 import json
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
-import requests
-from rembg import remove
+import httpx
 from PIL import Image
 
 # --- Custom Module Imports ---
+import background_remover
 from auto_tagger import AutoTagger
-from database import get_wardrobe_by_user, add_clothing_item, delete_clothing_item
+from database import get_wardrobe_by_user, add_clothing_item, delete_clothing_item, init_async_pool, close_async_pool
 from stylist import Stylist
 from ai_engine import InferenceEngine
+from shared_weights import freeze_for_fork, report_worker_memory
+from config import MODEL_THREADS, REMBG_PROCESSES, REMBG_SERVICE_URL
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,6 +31,82 @@ load_dotenv()
 app = FastAPI()
 ai_engine = InferenceEngine()
 auto_tagger = AutoTagger()
+freeze_for_fork()
+
+# --- Worker Pools and Clients ---
+# Handlers are async and only await I/O; CPU-bound model calls go to these pools, so slow
+# MySQL or weather requests don't wait behind inference and vice versa. Everything is created
+# per worker at startup: thread pools and onnxruntime sessions don't survive a fork.
+model_executor = None   # CLIP and ResNet
+rembg_executor = None   # rembg, one session per process; unused with the shared rembg service
+http_client = None
+
+async def start_rembg_pool():
+    """
+    Starts the rembg processes now rather than on the first upload, so a failing model load
+    shows up at startup. Returns the pool and the ids of its processes.
+    """
+    pool = ProcessPoolExecutor(max_workers=REMBG_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=background_remover.init_worker)
+    loop = asyncio.get_running_loop()
+    try:
+        pids = await asyncio.gather(*(loop.run_in_executor(pool, background_remover.worker_pid)
+                                      for _ in range(REMBG_PROCESSES)))
+    except BrokenProcessPool as e:
+        print(f"rembg worker failed to start: {e}")
+        pids = []
+    return pool, sorted(set(pids))
+
+@app.on_event("startup")
+async def start_worker_pools():
+    global model_executor, rembg_executor, http_client
+    model_executor = ThreadPoolExecutor(max_workers=MODEL_THREADS, thread_name_prefix="model")
+    http_client = httpx.AsyncClient(verify=False, timeout=10)
+    await init_async_pool()
+    if REMBG_SERVICE_URL:
+        report_worker_memory()
+        print(f"rembg: using the shared service at {REMBG_SERVICE_URL} (its memory is reported by that process)")
+    else:
+        rembg_executor, rembg_pids = await start_rembg_pool()
+        report_worker_memory(helper_pids=rembg_pids)
+        print(f"rembg: {REMBG_PROCESSES} private model copies in this worker's pool; "
+              f"set REMBG_SERVICE_URL to share one copy between workers")
+
+@app.on_event("shutdown")
+async def stop_worker_pools():
+    await http_client.aclose()
+    await close_async_pool()
+    model_executor.shutdown()
+    if rembg_executor is not None:
+        rembg_executor.shutdown()
+
+async def run_model(fn, *args):
+    """Runs a CLIP or ResNet call on the model thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(model_executor, fn, *args)
+
+async def remove_background(image_bytes: bytes) -> bytes:
+    """
+    Runs rembg, in the shared service or this worker's process pool, and returns the cut-out
+    image as PNG bytes. If a pool process has died the whole pool is unusable, so it is
+    replaced and the call retried once.
+    """
+    global rembg_executor
+    if REMBG_SERVICE_URL:
+        # Background removal can queue behind other workers' uploads, hence the longer timeout
+        response = await http_client.post(f"{REMBG_SERVICE_URL}/remove-background", content=image_bytes, timeout=60)
+        response.raise_for_status()
+        return response.content
+
+    loop = asyncio.get_running_loop()
+    executor = rembg_executor
+    try:
+        return await loop.run_in_executor(executor, background_remover.remove_background, image_bytes)
+    except BrokenProcessPool:
+        if rembg_executor is executor: # Another request may already have replaced it
+            print("rembg process pool is broken, starting a new one.")
+            executor.shutdown(wait=False)
+            rembg_executor, _ = await start_rembg_pool()
+        return await loop.run_in_executor(rembg_executor, background_remover.remove_background, image_bytes)
 
 # --- CORS Middleware Configuration ---
 origins = ["*"]
@@ -49,13 +132,13 @@ COIMBATORE_LAT = 11.0168
 COIMBATORE_LON = 76.9558
 WEATHER_URL = f"https://api.openweathermap.org/data/2.5/weather?lat={COIMBATORE_LAT}&lon={COIMBATORE_LON}&appid={WEATHER_API_KEY}&units=metric"
 
-def get_current_weather():
+async def get_current_weather():
     try:
-        response = requests.get(WEATHER_URL, verify=False)
+        response = await http_client.get(WEATHER_URL)
         response.raise_for_status()
         data = response.json()
         return {"temperature": int(data['main']['temp']), "condition": data['weather'][0]['main']}
-    except requests.exceptions.RequestException:
+    except httpx.HTTPError:
         return None
 
 def clear_user_cache(user_id: int):
@@ -66,21 +149,20 @@ def clear_user_cache(user_id: int):
 
 # --- API Endpoints ---
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Stylist Backend is running. Go to /docs."}
 
 @app.post("/wardrobe/{user_id}/upload-and-tag", response_model=AutoTagResponse)
-def analyze_and_tag_image(user_id: int, file: UploadFile = File(...)):
+async def analyze_and_tag_image(user_id: int, file: UploadFile = File(...)):
     try:
-        input_image = Image.open(file.file)
-        clean_image = remove(input_image)
-        tags = auto_tagger.tag_image(clean_image)
+        clean_image = Image.open(io.BytesIO(await remove_background(await file.read())))
+        tags = await run_model(auto_tagger.tag_image, clean_image)
         return {"tags": tags}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze image: {e}")
 
 @app.post("/wardrobe/{user_id}/add-verified", response_model=StatusResponse)
-def add_verified_item(user_id: int, file: UploadFile = File(...), item_data: str = Form(...)):
+async def add_verified_item(user_id: int, file: UploadFile = File(...), item_data: str = Form(...)):
     try:
         item_dict = json.loads(item_data)
     except json.JSONDecodeError:
@@ -90,13 +172,13 @@ def add_verified_item(user_id: int, file: UploadFile = File(...), item_data: str
     final_file_path = os.path.join("uploads", final_filename)
     
     try:
-        input_image = Image.open(file.file)
-        output_image = remove(input_image)
-        output_image.save(final_file_path)
+        output_bytes = await remove_background(await file.read())
+        with open(final_file_path, "wb") as f:
+            f.write(output_bytes)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process and save image: {e}")
     
-    success, detail = add_clothing_item(user_id, item_dict, final_file_path)
+    success, detail = await add_clothing_item(user_id, item_dict, final_file_path)
     
     if not success:
         raise HTTPException(status_code=400, detail=detail)
@@ -104,13 +186,18 @@ def add_verified_item(user_id: int, file: UploadFile = File(...), item_data: str
     clear_user_cache(user_id)
     return {"status": "success", "detail": f"Item '{item_dict['ItemName']}' added successfully."}
 
+def build_suggestion(wardrobe, occasion: str, weather: dict):
+    """Embeds the wardrobe and scores outfits. Runs on the model thread pool."""
+    personal_stylist = Stylist(wardrobe_data=wardrobe, ai_engine=ai_engine)
+    return personal_stylist.get_suggestion(occasion.capitalize(), weather['temperature'], weather['condition'])
+
 @app.get("/suggest/{user_id}", response_model=OutfitResponse)
-def suggest_for_user(user_id: int, occasion: str):
-    weather = get_current_weather()
+async def suggest_for_user(user_id: int, occasion: str):
+    # Both lookups are I/O, so wait on them together
+    weather, wardrobe = await asyncio.gather(get_current_weather(), get_wardrobe_by_user(user_id))
     if not weather:
         raise HTTPException(status_code=503, detail="Weather service unavailable.")
 
-    wardrobe = get_wardrobe_by_user(user_id)
     if not wardrobe:
         raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found.")
     
@@ -118,9 +205,7 @@ def suggest_for_user(user_id: int, occasion: str):
     if not wardrobe_with_images:
         raise HTTPException(status_code=404, detail="User wardrobe has no items with valid images.")
         
-    personal_stylist = Stylist(wardrobe_data=wardrobe_with_images, ai_engine=ai_engine)
-    
-    outfit_data = personal_stylist.get_suggestion(occasion.capitalize(), weather['temperature'], weather['condition'])
+    outfit_data = await run_model(build_suggestion, wardrobe_with_images, occasion, weather)
 
     if outfit_data:
         response_data = {**outfit_data, "current_weather": weather}
@@ -129,8 +214,8 @@ def suggest_for_user(user_id: int, occasion: str):
         raise HTTPException(status_code=404, detail="No suitable outfit found.")
         
 @app.delete("/wardrobe/{user_id}/{item_id}", response_model=StatusResponse)
-def delete_from_wardrobe(user_id: int, item_id: int):
-    success, detail = delete_clothing_item(user_id, item_id)
+async def delete_from_wardrobe(user_id: int, item_id: int):
+    success, detail = await delete_clothing_item(user_id, item_id)
     if not success:
         raise HTTPException(status_code=404, detail=detail)
     clear_user_cache(user_id)
@@ -9,11 +9,12 @@ class SiameseNetwork(nn.Module):
     The Siamese Network architecture. It has one "tower" or "encoder" that
     processes each image.
     """
-    def __init__(self, embedding_dim=128):
+    def __init__(self, embedding_dim=128, pretrained=True):
         super(SiameseNetwork, self).__init__()
         
         # 1. Load a pre-trained ResNet-18 model as the backbone
-        self.backbone = models.resnet18(weights='IMAGENET1K_V1')
+        # (inference passes pretrained=False, since the trained checkpoint replaces these weights anyway)
+        self.backbone = models.resnet18(weights='IMAGENET1K_V1' if pretrained else None)
         
         # 2. Get the number of input features from the ResNet's final layer
         num_features = self.backbone.fc.in_features
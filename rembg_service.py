@@ -0,0 +1,38 @@
+# rembg_service.py
+# One background-removal service shared by every API worker, so the rembg model is loaded once
+# per box instead of once per worker. Run it as a single process next to the API:
+#   uvicorn rembg_service:app --port 8001
+# and start the API with REMBG_SERVICE_URL=http://127.0.0.1:8001
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Request, Response
+
+import background_remover
+from config import REMBG_THREADS
+from shared_weights import report_worker_memory
+
+app = FastAPI()
+# onnxruntime releases the GIL while it runs and its sessions are thread-safe, so these
+# threads all share the one session (and the one copy of the model) in this process.
+executor = None
+
+@app.on_event("startup")
+def load_model():
+    global executor
+    background_remover.init_worker()
+    executor = ThreadPoolExecutor(max_workers=REMBG_THREADS, thread_name_prefix="rembg")
+    report_worker_memory()
+
+@app.on_event("shutdown")
+def stop_executor():
+    executor.shutdown()
+
+@app.post("/remove-background")
+async def remove_background(request: Request):
+    image_bytes = await request.body()
+    try:
+        png_bytes = await asyncio.get_running_loop().run_in_executor(
+            executor, background_remover.remove_background, image_bytes)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to remove background: {e}")
+    return Response(content=png_bytes, media_type="image/png")
@@ -0,0 +1,338 @@
+# seed_catalog.py - Bulk-loads the processed FISB crops into the base_items catalog
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+import torch
+from PIL import Image
+
+from ai_engine import InferenceEngine
+from auto_tagger import AutoTagger
+
+# --- 1. Configuration ---
+class SeedConfig:
+    PROCESSED_DATA_DIR = "processed_images"
+    SQLITE_PATH = "stylist_catalog.db" # Stand-in catalog used when MySQL isn't available
+
+    # Pipeline Parameters
+    QUEUE_SIZE = 256 # Max items waiting between two stages; a full queue pauses the stage before it
+    DECODE_WORKERS = 2
+    TAG_BATCH_SIZE = 32
+    EMBED_BATCH_SIZE = 32
+    INSERT_BATCH_SIZE = 500 # Items per transaction; every commit is a resume point
+    REPORT_INTERVAL = 30 # Seconds between throughput reports
+
+    # Tagging and embedding run torch at the same time, and each of them starts a team of this many
+    # threads, so half the cores each keeps them from oversubscribing the box. torch's thread count is
+    # process-wide, so it can't be split unevenly between two stages running in the same process.
+    TORCH_THREADS = max(1, (os.cpu_count() or 1) // 2)
+
+_DONE = object() # Sentinel that flows down the pipeline once the stage before it has finished
+
+def catalog_path(path):
+    """
+    Spells an image path the same way however --images was written (absolute, "./", trailing
+    slash), so resuming matches it against base_items.ImagePath.
+    """
+    try:
+        return os.path.relpath(os.path.abspath(path))
+    except ValueError: # On another Windows drive than the working directory
+        return os.path.abspath(path)
+
+# --- 2. Catalog Writer ---
+class CatalogWriter:
+    """
+    Writes seeded items to base_items, and their style embeddings to item_embeddings.
+    Works with any DB-API connection; only the SQL placeholder differs between MySQL and SQLite.
+    """
+    def __init__(self, conn, placeholder, is_sqlite):
+        self.conn = conn
+        self.placeholder = placeholder
+        self.is_sqlite = is_sqlite
+        self._create_tables()
+
+    def _create_tables(self):
+        cursor = self.conn.cursor()
+        if self.is_sqlite:
+            # MySQL already has base_items; the stand-in needs the same columns
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS base_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ItemName TEXT, Type TEXT, Color TEXT, ColorFamily TEXT, Style TEXT, Pattern TEXT,
+                    MinTemp INTEGER, MaxTemp INTEGER, ConditionType TEXT, ImagePath TEXT
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_base_items_image_path ON base_items (ImagePath)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS item_embeddings (item_id INT PRIMARY KEY, Embedding BLOB)")
+        self.conn.commit()
+        cursor.close()
+
+    def seeded_paths(self):
+        """Returns the image paths already in the catalog. Committed batches are the checkpoint."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT ImagePath FROM base_items")
+        paths = {catalog_path(row[0]) for row in cursor.fetchall() if row[0]}
+        cursor.close()
+        return paths
+
+    def insert_batch(self, items):
+        """Inserts a batch of tagged and embedded items in a single transaction."""
+        p = self.placeholder
+        query_insert_base = f"""
+            INSERT INTO base_items (ItemName, Type, Color, ColorFamily, Style, Pattern, MinTemp, MaxTemp, ConditionType, ImagePath)
+            VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p}, {p}, {p}, {p})
+        """
+        query_insert_embedding = f"INSERT INTO item_embeddings (item_id, Embedding) VALUES ({p}, {p})"
+
+        cursor = self.conn.cursor()
+        try:
+            embedding_rows = []
+            for item in items:
+                tags = item['tags']
+                cursor.execute(query_insert_base, (tags['ItemName'], tags['Type'], tags['Color'], tags['ColorFamily'],
+                                                   tags['Style'], tags['Pattern'], tags['MinTemp'], tags['MaxTemp'],
+                                                   tags['ConditionType'], item['path']))
+                embedding_rows.append((cursor.lastrowid, item['embedding'].astype(np.float32).tobytes()))
+            cursor.executemany(query_insert_embedding, embedding_rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+def open_catalog(sqlite_path, force_sqlite=False):
+    """Connects to the MySQL catalog, falling back to a local SQLite file when it isn't reachable."""
+    if not force_sqlite:
+        try:
+            from database import get_db_connection
+            conn = get_db_connection()
+        except ImportError:
+            conn = None
+        if conn is not None:
+            print("Seeding the MySQL catalog.")
+            return CatalogWriter(conn, "%s", is_sqlite=False)
+        print("MySQL isn't available.")
+
+    print(f"Seeding the SQLite stand-in catalog at {sqlite_path}")
+    # The connection is opened here but used from the insert stage's thread
+    conn = sqlite3.connect(sqlite_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return CatalogWriter(conn, "?", is_sqlite=True)
+
+# --- 3. Pipeline Stages ---
+def _put(q, item, stop_event):
+    """Blocks until there is room in the queue, unless the pipeline is being stopped."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            pass
+
+def _get(q, stop_event):
+    """Blocks until an item arrives. Returns the sentinel if the pipeline is being stopped."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            pass
+    return _DONE
+
+class Stage:
+    """
+    One step of the pipeline. Its workers pull batches from the inbox, run fn on them and
+    push the results to the outbox. Bounded queues on both sides provide the backpressure.
+    """
+    def __init__(self, name, fn, inbox, outbox, stop_event, batch_size=1, workers=1, uses_torch=False):
+        self.name = name
+        self.fn = fn
+        self.uses_torch = uses_torch
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.batch_size = batch_size
+        self.workers = workers
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _next_batch(self):
+        """Collects up to batch_size items. The second value is True once the inbox is exhausted."""
+        batch = []
+        while len(batch) < self.batch_size:
+            item = _get(self.inbox, self.stop_event)
+            if item is _DONE:
+                _put(self.inbox, _DONE, self.stop_event) # Let the other workers of this stage see it too
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        try:
+            finished = False
+            while not finished and not self.stop_event.is_set():
+                batch, finished = self._next_batch()
+                if not batch:
+                    continue
+                start_time = time.perf_counter()
+                results = self.fn(batch)
+                with self._lock:
+                    if self.uses_torch and self.processed == 0:
+                        print(f"{self.name} stage is running torch with {torch.get_num_threads()} threads")
+                    self.busy_seconds += time.perf_counter() - start_time
+                    self.processed += len(batch)
+                if self.outbox is not None:
+                    for result in results:
+                        _put(self.outbox, result, self.stop_event)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            with self._lock:
+                self._running -= 1
+                is_last_worker = self._running == 0
+            if is_last_worker and self.outbox is not None:
+                _put(self.outbox, _DONE, self.stop_event)
+
+def decode_images(paths):
+    """Opens each image. Unreadable files are skipped so one bad crop doesn't stop the run."""
+    items = []
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                items.append({"path": path, "image": image.convert("RGB")})
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}")
+    return items
+
+def report_throughput(stages, inboxes, elapsed):
+    print(f"--- {elapsed:.0f}s elapsed ---")
+    for stage, inbox in zip(stages, inboxes):
+        rate = stage.processed / elapsed if elapsed else 0.0
+        utilization = stage.busy_seconds / (elapsed * stage.workers) if elapsed else 0.0
+        print(f"  {stage.name:<7} {stage.processed:>8} items  {rate:7.1f} items/s  "
+              f"busy {utilization:4.0%}  queued {inbox.qsize()}")
+
+# --- 4. The Main Seeding Function ---
+def seed_catalog(image_dir, sqlite_path, force_sqlite=False, limit=None):
+    """
+    Streams the processed images through decode -> tag -> embed -> insert.
+    Already seeded images are skipped, so an interrupted run can simply be restarted.
+    Returns False if the run was interrupted or a stage failed.
+    """
+    writer = open_catalog(sqlite_path, force_sqlite)
+    seeded = writer.seeded_paths()
+
+    image_paths = sorted(catalog_path(os.path.join(image_dir, f)) for f in os.listdir(image_dir) if f.endswith('.jpg'))
+    pending = [path for path in image_paths if path not in seeded]
+    print(f"Found {len(image_paths)} images, {len(image_paths) - len(pending)} already seeded.")
+    if limit is not None:
+        pending = pending[:limit]
+    if not pending:
+        writer.close()
+        return True
+
+    auto_tagger = AutoTagger()
+    ai_engine = InferenceEngine()
+    torch.set_num_threads(SeedConfig.TORCH_THREADS)
+
+    def tag(items):
+        tags = auto_tagger.tag_images([item["image"] for item in items], batch_size=SeedConfig.TAG_BATCH_SIZE)
+        for item, item_tags in zip(items, tags):
+            item["tags"] = item_tags
+        return items
+
+    def embed(items):
+        embeddings = ai_engine.get_embeddings([item["image"] for item in items])
+        for item, embedding in zip(items, embeddings):
+            item["embedding"] = embedding
+            del item["image"] # Nothing downstream needs the pixels
+        return items
+
+    def insert(items):
+        writer.insert_batch(items)
+        return []
+
+    stop_event = threading.Event()
+    path_queue, decoded_queue, tagged_queue, embedded_queue = (
+        queue.Queue(maxsize=SeedConfig.QUEUE_SIZE) for _ in range(4))
+    stages = [
+        Stage("decode", decode_images, path_queue, decoded_queue, stop_event, workers=SeedConfig.DECODE_WORKERS),
+        Stage("tag", tag, decoded_queue, tagged_queue, stop_event, batch_size=SeedConfig.TAG_BATCH_SIZE,
+              uses_torch=True),
+        Stage("embed", embed, tagged_queue, embedded_queue, stop_event, batch_size=SeedConfig.EMBED_BATCH_SIZE,
+              uses_torch=True),
+        Stage("insert", insert, embedded_queue, None, stop_event, batch_size=SeedConfig.INSERT_BATCH_SIZE),
+    ]
+    inboxes = [path_queue, decoded_queue, tagged_queue, embedded_queue]
+    for stage in stages:
+        stage.start()
+
+    start_time = time.perf_counter()
+    last_report = start_time
+    try:
+        for path in pending:
+            _put(path_queue, path, stop_event)
+            now = time.perf_counter()
+            if now - last_report >= SeedConfig.REPORT_INTERVAL:
+                report_throughput(stages, inboxes, now - start_time)
+                last_report = now
+        _put(path_queue, _DONE, stop_event)
+
+        # Keep reporting while the later stages drain
+        stages[-1].join(timeout=SeedConfig.REPORT_INTERVAL)
+        while stages[-1].is_alive():
+            report_throughput(stages, inboxes, time.perf_counter() - start_time)
+            stages[-1].join(timeout=SeedConfig.REPORT_INTERVAL)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Everything up to the last committed batch is saved; rerun to resume.")
+        stop_event.set()
+        return False
+    finally:
+        for stage in stages:
+            stage.join()
+        writer.close()
+
+    for stage in stages:
+        if stage.error is not None:
+            print(f"The {stage.name} stage failed: {stage.error}")
+            print("Everything up to the last committed batch is saved; rerun to resume.")
+            return False
+    print("\nSeeding complete!")
+    report_throughput(stages, inboxes, time.perf_counter() - start_time)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load processed images into the base_items catalog.")
+    parser.add_argument("--images", default=SeedConfig.PROCESSED_DATA_DIR, help="Folder written by data_processor.py")
+    parser.add_argument("--sqlite", default=SeedConfig.SQLITE_PATH, help="SQLite file used when MySQL isn't available")
+    parser.add_argument("--force-sqlite", action="store_true", help="Seed the SQLite stand-in even if MySQL is up")
+    parser.add_argument("--limit", type=int, default=None, help="Seed at most this many new images")
+    args = parser.parse_args()
+    if not seed_catalog(args.images, args.sqlite, args.force_sqlite, args.limit):
+        raise SystemExit(1) # Lets cron or a wrapper script see that the run didn't finish
@@ -0,0 +1,165 @@
+# shared_weights.py
+# Helpers that let several server workers share one copy of the model weights.
+import contextlib
+import gc
+import glob
+import hashlib
+import os
+import torch
+
+try:
+    import fcntl
+except ImportError: # Windows: no file locks, concurrent first boots may each export a snapshot
+    fcntl = None
+
+from config import WEIGHT_LOAD_MODE, SHARED_WEIGHTS_DIR
+
+LOAD_MODES = ("mmap", "prefork", "private")
+if WEIGHT_LOAD_MODE not in LOAD_MODES:
+    raise ValueError(f"WEIGHT_LOAD_MODE must be one of {LOAD_MODES}, got '{WEIGHT_LOAD_MODE}'.")
+
+
+def _use_mmap(device):
+    # Memory-mapping only helps for weights that live in host memory
+    return WEIGHT_LOAD_MODE == "mmap" and torch.device(device).type == "cpu"
+
+
+def build_with_weights(factory, weights_path, device):
+    """
+    Builds a module with factory() and loads a saved state dict into it. In mmap mode the
+    module is built on the meta device, so no private copy of the weights is ever allocated:
+    load_state_dict(assign=True) then hands it the file-backed tensors directly.
+    """
+    if _use_mmap(device):
+        with torch.device("meta"):
+            module = factory()
+        state_dict = torch.load(weights_path, map_location="cpu", mmap=True, weights_only=True)
+        module.load_state_dict(state_dict, assign=True)
+        return module
+
+    module = factory()
+    module.load_state_dict(torch.load(weights_path, map_location=device))
+    return module
+
+
+def load_shared_module(name, get_version, factory, device):
+    """
+    Loads a whole module from a memory-mapped snapshot in SHARED_WEIGHTS_DIR.
+    The snapshot name includes a hash of get_version() (e.g. the model revision) and of the
+    torch version and default dtype, so a change to any of them makes workers export a fresh one.
+    Only the first worker calls factory(); the others wait for its snapshot and map it.
+    """
+    if not _use_mmap(device):
+        return factory()
+
+    key = f"{get_version()}|torch={torch.__version__}|dtype={torch.get_default_dtype()}"
+    snapshot_path = os.path.join(SHARED_WEIGHTS_DIR, f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.pt")
+    os.makedirs(SHARED_WEIGHTS_DIR, exist_ok=True)
+
+    with _snapshot_lock(name):
+        if not os.path.exists(snapshot_path):
+            _export_snapshot(name, factory, snapshot_path)
+
+    loaded_mtime = os.stat(snapshot_path).st_mtime_ns
+    try:
+        # The snapshot is a pickled module we wrote ourselves, hence weights_only=False
+        return torch.load(snapshot_path, map_location="cpu", mmap=True, weights_only=False)
+    except Exception as e:
+        # E.g. a library the key doesn't cover changed and the old pickle no longer loads
+        print(f"Could not load {snapshot_path} ({e}), exporting it again.")
+        with _snapshot_lock(name):
+            # Another worker may already have replaced it
+            if not os.path.exists(snapshot_path) or os.stat(snapshot_path).st_mtime_ns == loaded_mtime:
+                _export_snapshot(name, factory, snapshot_path)
+        return torch.load(snapshot_path, map_location="cpu", mmap=True, weights_only=False)
+
+
+@contextlib.contextmanager
+def _snapshot_lock(name):
+    """Lets one worker at a time export a snapshot, so the others don't each build the model too."""
+    with open(os.path.join(SHARED_WEIGHTS_DIR, f"{name}.lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX) # Released when the file is closed
+        yield
+
+
+def _export_snapshot(name, factory, snapshot_path):
+    module = factory()
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    torch.save(module, tmp_path)
+    os.replace(tmp_path, snapshot_path) # Atomic, so other workers never map a half-written file
+    del module
+    gc.collect()
+    print(f"Exported shared weights to {snapshot_path}")
+    # Snapshots of older versions are never mapped again
+    for stale in glob.glob(os.path.join(SHARED_WEIGHTS_DIR, f"{name}-*.pt")):
+        if stale != snapshot_path:
+            try:
+                os.remove(stale)
+            except OSError: # Still mapped by a running worker (Windows)
+                pass
+
+
+def freeze_for_fork():
+    """
+    Called once all models are loaded. In prefork mode this moves every object into the
+    permanent GC generation so the collector in each worker doesn't touch (and copy) the
+    pages inherited from the parent.
+    """
+    if WEIGHT_LOAD_MODE == "prefork":
+        gc.collect()
+        gc.freeze()
+
+
+def _read_memory_stats(pid="self"):
+    """Returns a process's memory breakdown in MB, or None if it can't be read."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if line.rstrip().endswith("kB"))
+    except OSError:
+        return None
+
+    def kb(key):
+        return int(fields.get(key, "0 kB").split()[0])
+
+    return {
+        "rss": kb("Rss") / 1024,
+        "pss": kb("Pss") / 1024,
+        "shared": (kb("Shared_Clean") + kb("Shared_Dirty")) / 1024,
+        "private": (kb("Private_Clean") + kb("Private_Dirty")) / 1024,
+    }
+
+
+def report_worker_memory(helper_pids=()):
+    """
+    Prints how much memory this worker uses and how much of it is shared with other workers.
+    helper_pids are the worker's own child processes (e.g. its rembg pool); they are listed
+    separately and included in the total, since they exist once per worker.
+    """
+    stats = _read_memory_stats()
+    if stats is None:
+        # Not Linux: only this process's peak resident size is available, with no shared/private
+        # split and nothing for running child processes. ru_maxrss is in bytes on macOS, KB elsewhere.
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        print(f"[worker {os.getpid()}] weight mode={WEIGHT_LOAD_MODE}, peak RSS={peak_mb:.0f} MB "
+              f"(detailed per-worker memory is only reported on Linux)")
+        return
+
+    def describe(s):
+        return (f"RSS={s['rss']:.0f} MB (shared {s['shared']:.0f} MB, private {s['private']:.0f} MB), "
+                f"PSS={s['pss']:.0f} MB")
+
+    print(f"[worker {os.getpid()}] weight mode={WEIGHT_LOAD_MODE}, {describe(stats)}")
+    total_pss, total_private = stats['pss'], stats['private']
+    for pid in helper_pids:
+        child_stats = _read_memory_stats(pid)
+        if child_stats is None:
+            continue
+        print(f"[worker {os.getpid()}]   child {pid}: {describe(child_stats)}")
+        total_pss += child_stats['pss']
+        total_private += child_stats['private']
+    if helper_pids:
+        print(f"[worker {os.getpid()}]   total with children: PSS={total_pss:.0f} MB, private {total_private:.0f} MB")